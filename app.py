@@ -2,12 +2,32 @@
 import os
 import sqlite3
 import json
-from datetime import datetime
-import requests
+import gzip
+import hashlib
+import threading
+import heapq
+import time
+from datetime import datetime, timezone
+from urllib.request import pathname2url
+from collections import deque
 import qrcode
 from werkzeug.security import generate_password_hash, check_password_hash
-from flask import Flask, g, render_template, request, redirect, url_for, session, jsonify
+from flask import Flask, g, render_template, request, redirect, url_for, session, jsonify, Response
 from dotenv import load_dotenv
+from notify import TelegramTransport, SenderPool
+import backup
+
+# brotli opsiyonel: kurulu değilse sadece gzip varyantı üretilir
+try:
+    import brotli
+except Exception:
+    brotli = None
+
+# orjson opsiyonel: compact liste yanıtlarında hızlı JSON encode için
+try:
+    import orjson
+except Exception:
+    orjson = None
 
 load_dotenv()
 
@@ -17,6 +37,23 @@ ADMIN_USER = os.getenv("ADMIN_USER", "admin")
 ADMIN_PASS = os.getenv("ADMIN_PASS", "secret")
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "")
 TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID", "")
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
+NOTIFY_WORKERS = int(os.getenv("NOTIFY_WORKERS", "4"))
+NOTIFY_CHAT_INTERVAL = float(os.getenv("NOTIFY_CHAT_INTERVAL", "1.0"))
+NOTIFY_GLOBAL_RATE = float(os.getenv("NOTIFY_GLOBAL_RATE", "25"))
+FEEDBACK_CACHE_MAX_AGE = int(os.getenv("FEEDBACK_CACHE_MAX_AGE", "300"))
+GZIP_MIN_SIZE = 512
+DISPATCH_SLA_SECONDS = int(os.getenv("DISPATCH_SLA_SECONDS", "900"))
+DISPATCH_SWEEP_INTERVAL = 5
+BATCH_MAX_ITEMS = 500
+CLIENT_TS_MAX_AGE_DAYS = 7
+SEARCH_MAX_PER_PAGE = 100
+# okuma yolu: off (yazıcı bağlantısı) | ro (mode=ro bağlantı, WAL) | snapshot (backup API ile kopya)
+READ_REPLICA = os.getenv("READ_REPLICA", "ro")
+# snapshot modunda kopya yaşı üst sınırı; her yenileme tüm veritabanını kopyalar, büyük DB'de yükseltin
+READ_MAX_STALENESS = float(os.getenv("READ_MAX_STALENESS", "30"))
+REPLICA_DIR = os.path.join(os.path.dirname(__file__), "replica")
+BACKUP_INTERVAL_MINUTES = float(os.getenv("BACKUP_INTERVAL_MINUTES", "0"))   # 0 = zamanlanmış yedek kapalı
 
 app = Flask(__name__, static_folder="static", template_folder="templates")
 app.secret_key = os.getenv("FLASK_SECRET", "dev-secret-change-it")
@@ -34,8 +71,117 @@ def query_db(query, args=(), one=False):
     cur.close()
     return (rv[0] if rv else None) if one else rv
 
+# READ REPLICA: liste, personel ve rapor endpoint'leri yazıcıdan ayrı bağlantıyla okur
+# snapshot modunda kopyalar arka plan thread'inde alınır; istek yolunda kopyalama yapılmaz.
+_replica_lock = threading.Lock()
+_replica_state = {"path": None, "taken_at": 0.0, "gen": 0, "refreshes": 0, "skipped": 0,
+                  "last_duration": None, "data_version": None, "worker": None}
+
+def _ro_connect(path):
+    db = sqlite3.connect("file:" + pathname2url(os.path.abspath(path)) + "?mode=ro", uri=True)
+    db.row_factory = sqlite3.Row
+    return db
+
+def _snapshot_gen(name):
+    # "snapshot.<gen>.db[-wal|-shm]" / "snapshot.<gen>.tmp" -> gen
+    try:
+        return int(name.split(".")[1])
+    except (IndexError, ValueError):
+        return None
+
+def refresh_replica_snapshot(src=None):
+    # backup API tutarlı bir kopya alır; yeni dosya hazır olunca okuyucular ona geçer.
+    # src verilirse (worker'ın kalıcı bağlantısı) veri değişmemişse kopya alınmaz.
+    with _replica_lock:
+        started = time.time()
+        own = src is None
+        if own:
+            src = sqlite3.connect(DB_PATH)
+        try:
+            version = src.execute("PRAGMA data_version").fetchone()[0]
+            if not own and _replica_state["path"] and version == _replica_state["data_version"]:
+                # başka bağlantıdan commit yok: mevcut kopya hâlâ güncel
+                _replica_state["taken_at"] = started
+                _replica_state["skipped"] += 1
+                return _replica_state["path"]
+            os.makedirs(REPLICA_DIR, exist_ok=True)
+            gen = _replica_state["gen"] + 1
+            tmp = os.path.join(REPLICA_DIR, f"snapshot.{gen}.tmp")
+            path = os.path.join(REPLICA_DIR, f"snapshot.{gen}.db")
+            dst = sqlite3.connect(tmp)
+            try:
+                src.backup(dst)
+                # kopya salt okunur açılır; WAL başlığı kalırsa -wal/-shm dosyaları oluşur
+                dst.execute("PRAGMA journal_mode = DELETE")
+            finally:
+                dst.close()
+        finally:
+            if own:
+                src.close()
+        os.replace(tmp, path)
+        _replica_state.update(path=path, taken_at=started, gen=gen, data_version=None if own else version,
+                              refreshes=_replica_state["refreshes"] + 1, last_duration=time.time() - started)
+        # bir önceki kopya, yolunu yeni almış okuyucular için korunur; daha eskiler silinir.
+        # Hâlâ açıksa (Windows) silinemez, sonraki yenilemede tekrar denenir.
+        for name in os.listdir(REPLICA_DIR):
+            old_gen = _snapshot_gen(name)
+            if name.startswith("snapshot.") and old_gen is not None and old_gen < gen - 1:
+                try:
+                    os.remove(os.path.join(REPLICA_DIR, name))
+                except OSError:
+                    pass
+        return path
+
+def _replica_worker():
+    src = sqlite3.connect(DB_PATH)
+    while True:
+        try:
+            refresh_replica_snapshot(src)
+        except Exception as e:
+            print("Replica snapshot hatası:", e)
+        time.sleep(max(READ_MAX_STALENESS - (_replica_state["last_duration"] or 0), 1.0))
+
+def start_replica_worker():
+    if READ_REPLICA != "snapshot":
+        return None
+    with _replica_lock:
+        if _replica_state["worker"] is None:
+            t = threading.Thread(target=_replica_worker, name="replica-snapshot", daemon=True)
+            t.start()
+            _replica_state["worker"] = t
+    return _replica_state["worker"]
+
+def replica_staleness():
+    if READ_REPLICA != "snapshot":
+        return 0.0
+    if _replica_state["path"] is None:
+        return None
+    return time.time() - _replica_state["taken_at"]
+
+def get_read_db():
+    if READ_REPLICA not in ("ro", "snapshot"):
+        return get_db()
+    db = getattr(g, "_read_database", None)
+    if db is None:
+        path = _replica_state["path"] if READ_REPLICA == "snapshot" else None
+        try:
+            # ilk kopya henüz hazır değilse ana dosya salt okunur açılır
+            db = _ro_connect(path or DB_PATH)
+        except sqlite3.OperationalError:
+            db = _ro_connect(_replica_state["path"] or DB_PATH)
+        g._read_database = db
+    return db
+
+def query_read(query, args=(), one=False):
+    cur = get_read_db().execute(query, args)
+    rv = cur.fetchall()
+    cur.close()
+    return (rv[0] if rv else None) if one else rv
+
 def init_db():
     db = get_db()
+    # WAL: okuyucular yazıcıyı bloklamaz (mode=ro okuma yolu için gerekli)
+    db.execute("PRAGMA journal_mode = WAL")
     # locations (floor column dahil)
     db.execute("""
     CREATE TABLE IF NOT EXISTS locations (
@@ -59,6 +205,11 @@ def init_db():
         meta TEXT,
         reported_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         resolved INTEGER DEFAULT 0,
+        assigned_to INTEGER,
+        assigned_at TIMESTAMP,
+        claimed_at TIMESTAMP,
+        resolved_at TIMESTAMP,
+        client_key TEXT,
         FOREIGN KEY(location_id) REFERENCES locations(id)
     );
     """)
@@ -69,6 +220,7 @@ def init_db():
         username TEXT UNIQUE,
         password_hash TEXT,
         is_admin INTEGER DEFAULT 0,
+        telegram_chat_id TEXT,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
     );
     """)
@@ -88,12 +240,88 @@ def init_db():
     except Exception:
         # column varsa veya başka hata varsa atla
         pass
+    # dispatch sütunları (eski feedbacks tabloları için)
+    for col in ("assigned_to INTEGER", "assigned_at TIMESTAMP", "claimed_at TIMESTAMP", "resolved_at TIMESTAMP",
+                "client_key TEXT"):
+        try:
+            db.execute(f"ALTER TABLE feedbacks ADD COLUMN {col}")
+            db.commit()
+        except Exception:
+            pass
+    # personel bazlı bildirim için chat id
+    try:
+        db.execute("ALTER TABLE users ADD COLUMN telegram_chat_id TEXT")
+        db.commit()
+    except Exception:
+        pass
+    # idempotency: aynı client_key ikinci kez eklenmez (NULL'lar serbest)
+    db.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_feedbacks_client_key ON feedbacks(client_key)")
+    # çözülen kayıtlar tabloda kalır; açık liste / dispatch yüklemesi sadece açıkları tarar
+    db.execute("CREATE INDEX IF NOT EXISTS idx_feedbacks_open ON feedbacks(reported_at) WHERE resolved = 0")
+    # arama filtreleri: tarih aralığı ve lokasyon (yeniden eskiye, id sırası)
+    db.execute("CREATE INDEX IF NOT EXISTS idx_feedbacks_reported_at ON feedbacks(reported_at)")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_feedbacks_location ON feedbacks(location_id, id)")
+    db.commit()
+    init_search_index(db)
+
+# FTS5 arama indeksi: not, durum özeti ve issue etiketleri (rowid = feedbacks.id)
+# meta JSON'dan alanlar trigger içinde çıkarılır; bozuk JSON ya da nesne olmayan issue elemanları eklemeyi engellemez.
+FTS_META = "CASE WHEN json_valid({r}.meta) THEN {r}.meta ELSE '{{}}' END"
+FTS_VALUES = (
+    "json_extract(" + FTS_META + ", '$.note'), {r}.status, "
+    "(SELECT group_concat(json_extract(value, '$.label'), ' ') FROM json_each(" + FTS_META + ", '$.issues') "
+    "WHERE json_each.type = 'object')"
+)
+
+def init_search_index(db):
+    try:
+        db.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS feedbacks_fts USING fts5(
+            note, status, labels,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        );
+        """)
+    except sqlite3.OperationalError as e:
+        # sqlite FTS5 olmadan derlenmişse arama devre dışı kalır
+        print("FTS5 kullanılamıyor:", e)
+        return False
+    db.executescript(f"""
+    CREATE TRIGGER IF NOT EXISTS feedbacks_fts_ai AFTER INSERT ON feedbacks BEGIN
+        INSERT INTO feedbacks_fts(rowid, note, status, labels) VALUES (new.id, {FTS_VALUES.format(r="new")});
+    END;
+    CREATE TRIGGER IF NOT EXISTS feedbacks_fts_ad AFTER DELETE ON feedbacks BEGIN
+        DELETE FROM feedbacks_fts WHERE rowid = old.id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS feedbacks_fts_au AFTER UPDATE OF status, meta ON feedbacks BEGIN
+        DELETE FROM feedbacks_fts WHERE rowid = old.id;
+        INSERT INTO feedbacks_fts(rowid, note, status, labels) VALUES (new.id, {FTS_VALUES.format(r="new")});
+    END;
+    """)
+    # trigger'lardan önce eklenmiş kayıtlar için bir kerelik doldurma
+    db.execute(f"""
+        INSERT INTO feedbacks_fts(rowid, note, status, labels)
+        SELECT f.id, {FTS_VALUES.format(r="f")} FROM feedbacks f
+        WHERE f.id > (SELECT COALESCE(MAX(rowid), 0) FROM feedbacks_fts)
+    """)
+    db.commit()
+    return True
+
+# arka plan işleri (dispatch sweep, snapshot, yedek) ilk istekte başlatılır; WSGI sunucularında da çalışır
+@app.before_request
+def _start_background_workers():
+    start_dispatch_worker()
+    start_replica_worker()
+    start_backup_scheduler()
 
 @app.teardown_appcontext
 def close_connection(exception):
     db = getattr(g, "_database", None)
     if db is not None:
         db.close()
+    db = getattr(g, "_read_database", None)
+    if db is not None:
+        db.close()
 
 # helper: options
 def options_for_type(typ):
@@ -124,19 +352,88 @@ def create_qr_for_code(code):
     img.save(img_path)
     return img_path, url
 
-# telegram send
-def send_telegram_message(text):
-    token = TELEGRAM_BOT_TOKEN
-    chat_id = TELEGRAM_CHAT_ID
-    if not token or not chat_id:
-        return False
-    try:
-        url = f"https://api.telegram.org/bot{token}/sendMessage"
-        resp = requests.post(url, data={"chat_id": chat_id, "text": text})
-        return resp.status_code == 200
-    except Exception as e:
-        print("Telegram error:", e)
+# telegram send: mesajlar hız limitli gönderim havuzundan geçer (bkz. notify.py)
+notify_pool = SenderPool(
+    TelegramTransport(TELEGRAM_BOT_TOKEN, TELEGRAM_API_URL),
+    workers=NOTIFY_WORKERS,
+    chat_interval=NOTIFY_CHAT_INTERVAL,
+    global_rate=NOTIFY_GLOBAL_RATE,
+)
+
+def send_telegram_message(text, chat_id=None):
+    chat_id = chat_id or TELEGRAM_CHAT_ID
+    if not TELEGRAM_BOT_TOKEN or not chat_id:
         return False
+    return notify_pool.submit(chat_id, text)
+
+def notification_chats(floor, assignee=None):
+    # önce atanan personel, yoksa katın tüm personeli, o da yoksa genel chat
+    if assignee is not None:
+        row = query_db("SELECT telegram_chat_id FROM users WHERE id = ?", [assignee], one=True)
+        if row and row["telegram_chat_id"]:
+            return [row["telegram_chat_id"]]
+    rows = query_db("""
+        SELECT DISTINCT u.telegram_chat_id
+        FROM users u
+        JOIN user_floors uf ON uf.user_id = u.id
+        WHERE uf.floor = ? AND COALESCE(u.telegram_chat_id, '') <> ''
+    """, [floor])
+    chats = [r["telegram_chat_id"] for r in rows]
+    return chats or [TELEGRAM_CHAT_ID]
+
+def notify_feedback(loc, text, assignee=None):
+    for chat_id in notification_chats(loc["floor"], assignee):
+        send_telegram_message(text, chat_id)
+
+# feedback sayfası render cache'i: code -> {key, etag, identity, gzip, br}
+# key = (name, type, floor); bunlardan biri değişirse sayfa yeniden render edilir.
+_feedback_page_cache = {}
+_feedback_page_cache_lock = threading.Lock()
+
+def _feedback_cache_key(loc):
+    return (loc["name"], loc["type"], loc["floor"])
+
+def _render_feedback_entry(loc):
+    opts = options_for_type(loc["type"])
+    body = render_template("feedback.html", location=loc, options=opts, batch_max=BATCH_MAX_ITEMS).encode("utf-8")
+    return {
+        "key": _feedback_cache_key(loc),
+        "etag": hashlib.sha256(body).hexdigest()[:32],
+        "identity": body,
+        "gzip": gzip.compress(body, compresslevel=9),
+        "br": brotli.compress(body) if brotli is not None else None,
+    }
+
+def get_feedback_page_entry(loc):
+    entry = _feedback_page_cache.get(loc["code"])
+    if entry is not None and entry["key"] == _feedback_cache_key(loc):
+        return entry
+    entry = _render_feedback_entry(loc)
+    with _feedback_page_cache_lock:
+        _feedback_page_cache[loc["code"]] = entry
+    return entry
+
+def _cached_page_response(entry):
+    # istemcinin kabul ettiği en iyi sıkıştırılmış varyantı seç
+    accept = request.accept_encodings
+    if entry["br"] is not None and accept["br"]:
+        encoding, body = "br", entry["br"]
+    elif accept["gzip"]:
+        encoding, body = "gzip", entry["gzip"]
+    else:
+        encoding, body = None, entry["identity"]
+    # strong ETag: her kodlama ayrı bir temsil olduğu için etag'e eklenir
+    etag = entry["etag"] + ("-" + encoding if encoding else "")
+    if request.if_none_match.contains(etag):
+        resp = Response(status=304)
+    else:
+        resp = Response(body, mimetype="text/html")
+        if encoding:
+            resp.headers["Content-Encoding"] = encoding
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = f"public, max-age={FEEDBACK_CACHE_MAX_AGE}"
+    resp.headers["Vary"] = "Accept-Encoding"
+    return resp
 
 # PUBLIC: feedback page
 @app.get("/feedback")
@@ -144,18 +441,259 @@ def feedback_page():
     code = request.args.get("loc")
     if not code:
         return "Eksik parametre. (loc gerekli)", 400
-    loc = query_db("SELECT * FROM locations WHERE code = ?", [code], one=True)
+    loc = query_db("SELECT id, code, name, type, floor FROM locations WHERE code = ?", [code], one=True)
     if not loc:
         return "Konum bulunamadı.", 404
-    opts = options_for_type(loc["type"])
-    return render_template("feedback.html", location=loc, options=opts)
+    return _cached_page_response(get_feedback_page_entry(loc))
 
-# PUBLIC API: feedback al
-@app.post("/api/feedback")
-def api_feedback():
-    data = request.get_json() or request.form
-    code = data.get("location_code") or data.get("loc") or data.get("location")
-    issues = data.get("issues") or []
+# DISPATCH: açık bildirimlerin personele atanması
+# Bellekte öncelik kuyruğu tutulur (önem derecesi, sonra yaş); atama bilgisi
+# feedbacks tablosuna da yazılır, böylece yeniden başlatmada kuyruk DB'den kurulur.
+ISSUE_SEVERITY = {
+    "floor_wet": 3,         # kayma riski
+    "dirty": 2,
+    "cleaning_needed": 2,
+    "room_vacated": 2,
+    "paper_out": 1,
+    "soap_out": 1,
+    "linen_change": 1,
+    "trash_full": 1,
+}
+
+_dispatch_lock = threading.RLock()
+_dispatch_items = {}    # fid -> {floor, code, name, severity, reported_ts, assigned_to, assigned_ts, claimed, ver}
+_dispatch_pending = []  # atanmayı bekleyenler: (-severity, reported_ts, fid)
+_dispatch_deadlines = []  # üstlenilmemiş atamaların SLA süresi: (deadline, fid, ver)
+_dispatch_load_count = {}   # uid -> açık atanmış iş sayısı
+_dispatch_state = {"loaded": False, "worker": None, "last_sweep": None}
+
+def issue_severity(issue_ids):
+    return max([ISSUE_SEVERITY.get(i, 1) for i in issue_ids] or [1])
+
+def meta_severity(raw_meta):
+    issues = _parse_meta(raw_meta).get("issues")
+    return issue_severity([i.get("id") for i in issues if isinstance(i, dict)] if isinstance(issues, list) else [])
+
+def _sqlite_ts(value):
+    # sqlite datetime('now') -> UTC epoch
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value[:19], "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc).timestamp()
+    except Exception:
+        return None
+
+def _sqlite_now():
+    return datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+
+def _dispatch_assign(item, uid, claimed=False, assigned_ts=None):
+    # sadece bellek; çağıran _dispatch_lock'u tutar. Yük sayaçları ve kuyruklar burada güncellenir.
+    old = item["assigned_to"]
+    if old is not None:
+        _dispatch_load_count[old] = _dispatch_load_count.get(old, 1) - 1
+    if uid is not None:
+        _dispatch_load_count[uid] = _dispatch_load_count.get(uid, 0) + 1
+    item["assigned_to"] = uid
+    item["assigned_ts"] = (assigned_ts or time.time()) if uid is not None else None
+    item["claimed"] = claimed
+    item["ver"] += 1
+    if uid is None:
+        heapq.heappush(_dispatch_pending, (-item["severity"], item["reported_ts"], item["fid"]))
+    elif not claimed:
+        heapq.heappush(_dispatch_deadlines, (item["assigned_ts"] + DISPATCH_SLA_SECONDS, item["fid"], item["ver"]))
+
+def _dispatch_add(fid, floor, code, name, severity, reported_ts, assigned_to=None, assigned_ts=None, claimed=False):
+    item = _dispatch_items[fid] = {
+        "fid": fid, "floor": floor, "code": code, "name": name, "severity": severity,
+        "reported_ts": reported_ts or time.time(),
+        "assigned_to": None, "assigned_ts": None, "claimed": False, "ver": 0,
+    }
+    _dispatch_assign(item, assigned_to, claimed, assigned_ts)
+
+def _dispatch_load():
+    if _dispatch_state["loaded"]:
+        return
+    # sorgu kilit dışında; ilk yükleyen doldurur
+    rows = query_db("""
+        SELECT f.id, f.meta, f.reported_at, f.assigned_to, f.assigned_at, f.claimed_at, l.floor, l.code, l.name
+        FROM feedbacks f
+        JOIN locations l ON l.id = f.location_id
+        WHERE f.resolved = 0
+    """)
+    with _dispatch_lock:
+        if _dispatch_state["loaded"]:
+            return
+        for r in rows:
+            if r["id"] in _dispatch_items:
+                continue
+            _dispatch_add(r["id"], r["floor"], r["code"], r["name"], meta_severity(r["meta"]), _sqlite_ts(r["reported_at"]),
+                          r["assigned_to"], _sqlite_ts(r["assigned_at"]), bool(r["claimed_at"]))
+        _dispatch_state["loaded"] = True
+
+def _floor_staff(floor=None):
+    # kat -> personel id listesi (tek sorgu)
+    if floor is None:
+        rows = query_db("SELECT user_id, floor FROM user_floors")
+    else:
+        rows = query_db("SELECT user_id, floor FROM user_floors WHERE floor = ?", [floor])
+    out = {}
+    for r in rows:
+        out.setdefault(r["floor"], []).append(r["user_id"])
+    return out
+
+def _dispatch_pick_staff(staff, exclude=None):
+    # en az yüklü personel (eşitlikte küçük id); yük sayaçları güncel tutulur
+    staff = [uid for uid in staff or [] if uid != exclude]
+    if not staff:
+        return None
+    return min(staff, key=lambda uid: (_dispatch_load_count.get(uid, 0), uid))
+
+def _dispatch_persist(changes):
+    # changes: [(fid, uid, claimed)]; kilit dışında yazılır
+    if not changes:
+        return
+    now = _sqlite_now()
+    db = get_db()
+    db.executemany("UPDATE feedbacks SET assigned_to=?, assigned_at=?, claimed_at=? WHERE id=? AND resolved = 0",
+                   [(uid, now if uid is not None else None, now if claimed else None, fid)
+                    for fid, uid, claimed in changes])
+    db.commit()
+
+def _notify_reassigned(changes):
+    for fid, uid, _ in changes:
+        item = _dispatch_items.get(fid)
+        if uid is None or item is None:
+            continue
+        text = f"Size atandı\n{item['name']} ({item['code']})\nKat: {item['floor']}"
+        notify_feedback({"floor": item["floor"]}, text, uid)
+
+def dispatch_new(fid, loc, issue_ids):
+    _dispatch_load()
+    staff = _floor_staff(loc["floor"]).get(loc["floor"])
+    with _dispatch_lock:
+        if fid not in _dispatch_items:
+            _dispatch_add(fid, loc["floor"], loc["code"], loc["name"], issue_severity(issue_ids), time.time())
+        item = _dispatch_items[fid]
+        uid = _dispatch_pick_staff(staff)
+        if uid is not None:
+            _dispatch_assign(item, uid)
+    _dispatch_persist([(fid, uid, False)] if uid is not None else [])
+    return uid
+
+def dispatch_claim(fid, uid, floors):
+    _dispatch_load()
+    with _dispatch_lock:
+        item = _dispatch_items.get(fid)
+        if item is None:
+            return "not found", 404
+        if item["floor"] not in floors:
+            return "forbidden", 403
+        if item["claimed"] and item["assigned_to"] != uid:
+            return "already claimed", 409
+        _dispatch_assign(item, uid, claimed=True)
+    _dispatch_persist([(fid, uid, True)])
+    return None, 200
+
+def dispatch_release(fid, uid=None):
+    # uid None -> admin; aksi halde sadece atanan kişi bırakabilir
+    _dispatch_load()
+    with _dispatch_lock:
+        item = _dispatch_items.get(fid)
+        if item is None:
+            return "not found", 404
+        if uid is not None and item["assigned_to"] != uid:
+            return "forbidden", 403
+        floor, releaser = item["floor"], item["assigned_to"]
+    staff = _floor_staff(floor).get(floor)
+    with _dispatch_lock:
+        if fid not in _dispatch_items:
+            return None, 200
+        new_uid = _dispatch_pick_staff(staff, exclude=releaser)
+        _dispatch_assign(item, new_uid)
+    changes = [(fid, new_uid, False)]
+    _dispatch_persist(changes)
+    _notify_reassigned(changes)
+    return None, 200
+
+def dispatch_resolved(fid):
+    with _dispatch_lock:
+        item = _dispatch_items.pop(fid, None)
+        if item is not None and item["assigned_to"] is not None:
+            _dispatch_load_count[item["assigned_to"]] -= 1
+
+def dispatch_drop_staff(uid):
+    # silinen personelin açık işleri diğerlerine dağıtılır
+    _dispatch_load()
+    staff = _floor_staff()
+    changes = []
+    with _dispatch_lock:
+        for fid, item in list(_dispatch_items.items()):
+            if item["assigned_to"] == uid:
+                new_uid = _dispatch_pick_staff(staff.get(item["floor"]), exclude=uid)
+                _dispatch_assign(item, new_uid)
+                changes.append((fid, new_uid, False))
+        _dispatch_load_count.pop(uid, None)
+    _dispatch_persist(changes)
+    _notify_reassigned(changes)
+
+def dispatch_sweep():
+    # 1) SLA'sı dolan üstlenilmemiş işler başka personele, 2) atanmamış işler öncelik sırasıyla atanır
+    _dispatch_load()
+    staff = _floor_staff()
+    now = time.time()
+    changes = []
+    with _dispatch_lock:
+        while _dispatch_deadlines and _dispatch_deadlines[0][0] <= now:
+            _, fid, ver = heapq.heappop(_dispatch_deadlines)
+            item = _dispatch_items.get(fid)
+            if item is None or item["ver"] != ver or item["claimed"]:
+                continue
+            uid = _dispatch_pick_staff(staff.get(item["floor"]), exclude=item["assigned_to"])
+            if uid is None:
+                # başka uygun personel yok: atama kalır, bir SLA sonra tekrar bakılır
+                heapq.heappush(_dispatch_deadlines, (now + DISPATCH_SLA_SECONDS, fid, ver))
+                continue
+            _dispatch_assign(item, uid)
+            changes.append((fid, uid, False))
+        waiting = []
+        while _dispatch_pending:
+            entry = heapq.heappop(_dispatch_pending)
+            item = _dispatch_items.get(entry[2])
+            if item is None or item["assigned_to"] is not None:
+                continue
+            uid = _dispatch_pick_staff(staff.get(item["floor"]))
+            if uid is None:
+                waiting.append(entry)
+                continue
+            _dispatch_assign(item, uid)
+            changes.append((item["fid"], uid, False))
+        # katında personel olmayanlar kuyruğa geri
+        for entry in waiting:
+            heapq.heappush(_dispatch_pending, entry)
+        _dispatch_state["last_sweep"] = now
+    _dispatch_persist(changes)
+    _notify_reassigned(changes)
+    return len(changes)
+
+def _dispatch_worker():
+    while True:
+        time.sleep(DISPATCH_SWEEP_INTERVAL)
+        try:
+            with app.app_context():
+                dispatch_sweep()
+        except Exception as e:
+            print("Dispatch sweep hatası:", e)
+
+def start_dispatch_worker():
+    with _dispatch_lock:
+        if _dispatch_state["worker"] is None:
+            t = threading.Thread(target=_dispatch_worker, name="dispatch-sweep", daemon=True)
+            t.start()
+            _dispatch_state["worker"] = t
+
+# feedback kaydı oluşturma yardımcıları (tekli ve toplu endpoint ortak)
+def parse_issues(issues):
+    issues = issues or []
     if isinstance(issues, str):
         try:
             parsed = json.loads(issues)
@@ -165,12 +703,9 @@ def api_feedback():
                 issues = [issues]
         except Exception:
             issues = [issues]
-    note = data.get("note") or ""
-    if not code or (not issues and not note):
-        return jsonify({"error":"Eksik alan (en az bir seçenek seçilmeli veya not girilmeli)"}), 400
-    loc = query_db("SELECT * FROM locations WHERE code = ?", [code], one=True)
-    if not loc:
-        return jsonify({"error":"Konum bulunamadı"}), 400
+    return issues
+
+def build_feedback(loc, issues, note):
     mapping = {opt["id"]: opt["label"] for opt in options_for_type(loc["type"])}
     issues_with_label = []
     for i in issues:
@@ -181,17 +716,149 @@ def api_feedback():
         "note": note,
         "reported_at": datetime.utcnow().isoformat() + "Z"
     }
-    db = get_db()
-    db.execute("INSERT INTO feedbacks (location_id, status, meta, reported_at) VALUES (?,?,?,datetime('now'))",
-               (loc["id"], status_summary, json.dumps(meta_obj, ensure_ascii=False)))
+    return status_summary, meta_obj
+
+def client_reported_at(value):
+    # istemci zamanı (ISO 8601 veya epoch ms) -> sqlite UTC; gelecekteki veya çok eski değerler reddedilir
+    if not value:
+        return None
+    try:
+        if isinstance(value, (int, float)):
+            ts = value / 1000.0
+        else:
+            ts = datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except Exception:
+        return None
+    now = time.time()
+    if ts > now or now - ts > CLIENT_TS_MAX_AGE_DAYS * 86400:
+        return None
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+def feedback_record_error(issues, note, client_key=None):
+    # kayıt alanlarının tip kontrolü; hata mesajı veya None
+    if not isinstance(issues, list) or not all(isinstance(i, str) for i in issues):
+        return "issues metin listesi olmalı"
+    if not isinstance(note, str):
+        return "note metin olmalı"
+    if client_key is not None and (not isinstance(client_key, str) or len(client_key) > 128):
+        return "client_key en fazla 128 karakterlik metin olmalı"
+    if not issues and not note:
+        return "Eksik alan"
+    return None
+
+def insert_feedback(db, loc, status_summary, meta_obj, client_key=None, reported_at=None):
+    # client_key tekrar ederse None döner (diğer kısıt hataları exception olarak yükselir)
+    cur = db.execute("""INSERT INTO feedbacks (location_id, status, meta, reported_at, client_key)
+                        VALUES (?,?,?,COALESCE(?, datetime('now')),?)
+                        ON CONFLICT(client_key) DO NOTHING""",
+                     (loc["id"], status_summary, json.dumps(meta_obj, ensure_ascii=False), reported_at, client_key))
+    if cur.rowcount == 0:
+        return None
     db.execute("UPDATE locations SET last_status=?, updated_at=datetime('now') WHERE id=?", (status_summary, loc["id"]))
+    return cur.lastrowid
+
+# PUBLIC API: feedback al
+@app.post("/api/feedback")
+def api_feedback():
+    data = request.get_json() or request.form
+    code = data.get("location_code") or data.get("loc") or data.get("location")
+    issues = parse_issues(data.get("issues"))
+    note = data.get("note") or ""
+    if not code or (not issues and not note):
+        return jsonify({"error":"Eksik alan (en az bir seçenek seçilmeli veya not girilmeli)"}), 400
+    err = feedback_record_error(issues, note, data.get("client_key") or None)
+    if err:
+        return jsonify({"error": err}), 400
+    loc = query_db("SELECT * FROM locations WHERE code = ?", [code], one=True)
+    if not loc:
+        return jsonify({"error":"Konum bulunamadı"}), 400
+    status_summary, meta_obj = build_feedback(loc, issues, note)
+    db = get_db()
+    started = time.time()
+    fid = insert_feedback(db, loc, status_summary, meta_obj, data.get("client_key") or None)
     db.commit()
-    # Telegram (demo): admin chat receives all messages (per-personalization later)
+    _write_latencies.append((started, time.time() - started))
+    if fid is None:
+        return jsonify({"ok": True, "duplicate": True})
+    assignee = dispatch_new(fid, loc, [it["id"] for it in meta_obj["issues"]])
+    # Telegram: atanan personele / kat sorumlularına yönlendirilir
     text = f"Yeni bildirim\n{loc['name']} ({loc['code']})\nDurum: {status_summary}\nNot: {note}"
-    send_telegram_message(text)
+    notify_feedback(loc, text, assignee)
     print(f"[NOTIFY] Lokasyon: {loc['name']} ({loc['code']}) - Durum: {status_summary} - Not: {note} - Zaman: {datetime.now()}")
     return jsonify({"ok": True})
 
+# PUBLIC API: toplu feedback (offline kuyruk, kiosklar)
+# Tüm kayıtlar tek transaction'da eklenir; client_key ile tekrarlar atlanır.
+# Geçici SQLite hatasında 503 döner ve hiçbir kayıt eklenmez (istemci kuyruğu korur).
+@app.post("/api/feedback/batch")
+def api_feedback_batch():
+    data = request.get_json(silent=True) or {}
+    items = data.get("items") if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return jsonify({"error":"items listesi gerekli"}), 400
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({"error":f"En fazla {BATCH_MAX_ITEMS} kayıt gönderilebilir"}), 413
+    codes = {str(it.get("location_code") or it.get("loc") or "") for it in items if isinstance(it, dict)}
+    placeholders = ",".join(["?"]*len(codes))
+    locs = {r["code"]: r for r in query_db(f"SELECT * FROM locations WHERE code IN ({placeholders})", list(codes))}
+    db = get_db()
+    started = time.time()
+    results, created = [], []
+    # her kayıt kendi SAVEPOINT'inde: hatalı kayıt sadece kendi sonucunu "error" yapar
+    for it in items:
+        if not isinstance(it, dict):
+            results.append({"status": "error", "error": "geçersiz kayıt"})
+            continue
+        key = it.get("client_key") or None
+        echo_key = key if isinstance(key, str) else None
+        loc = locs.get(str(it.get("location_code") or it.get("loc") or ""))
+        issues = parse_issues(it.get("issues"))
+        note = it.get("note") or ""
+        if not loc:
+            results.append({"client_key": echo_key, "status": "error", "error": "Konum bulunamadı"})
+            continue
+        err = feedback_record_error(issues, note, key)
+        if err:
+            results.append({"client_key": echo_key, "status": "error", "error": err})
+            continue
+        db.execute("SAVEPOINT batch_item")
+        try:
+            status_summary, meta_obj = build_feedback(loc, issues, note)
+            reported_at = client_reported_at(it.get("client_ts"))
+            if reported_at:
+                meta_obj["client_ts"] = it.get("client_ts")
+            fid = insert_feedback(db, loc, status_summary, meta_obj, key, reported_at)
+            db.execute("RELEASE batch_item")
+        except sqlite3.OperationalError as e:
+            # geçici hata (örn. database is locked): tüm toplu istek geri alınır, istemci tekrar dener
+            db.rollback()
+            return jsonify({"error":"db geçici hata: "+str(e)}), 503
+        except Exception as e:
+            db.execute("ROLLBACK TO batch_item")
+            db.execute("RELEASE batch_item")
+            results.append({"client_key": echo_key, "status": "error", "error": str(e)})
+            continue
+        if fid is None:
+            results.append({"client_key": key, "status": "duplicate"})
+            continue
+        created.append((fid, loc, status_summary, meta_obj))
+        results.append({"client_key": key, "status": "ok", "id": fid})
+    try:
+        db.commit()
+    except sqlite3.OperationalError as e:
+        db.rollback()
+        return jsonify({"error":"db geçici hata: "+str(e)}), 503
+    except Exception as e:
+        db.rollback()
+        return jsonify({"error":"db error: "+str(e)}), 500
+    _write_latencies.append((started, time.time() - started))
+    # aynı chat'e giden mesajlar gönderim havuzunda özet mesajda birleşir
+    for fid, loc, status_summary, meta_obj in created:
+        assignee = dispatch_new(fid, loc, [i["id"] for i in meta_obj["issues"]])
+        text = f"Yeni bildirim\n{loc['name']} ({loc['code']})\nDurum: {status_summary}\nNot: {meta_obj['note']}"
+        notify_feedback(loc, text, assignee)
+    return jsonify({"ok": True, "inserted": len(created), "results": results})
+
 # ADMIN: login & panel
 @app.get("/admin")
 def admin_index():
@@ -213,8 +880,9 @@ def admin_logout():
     session.pop("admin", None)
     return redirect(url_for("admin_index"))
 
-# admin_resolve: hem admin hem staff için çalışır; staff sadece kendi katları için silme yapabilir
+# admin_resolve: hem admin hem staff için çalışır; staff sadece kendi katları için kapatma yapabilir
 @app.post("/admin/resolve")
+@app.post("/staff/resolve")
 def admin_resolve():
     fid = request.form.get("feedback_id") or (request.get_json() or {}).get("feedback_id")
     if not fid:
@@ -249,12 +917,15 @@ def admin_resolve():
     if not allowed:
         return jsonify({"error":"forbidden"}), 403
 
-    # İSTEM: silmek istiyoruz (anında)
+    # kayıt silinmez; resolved_at ile çözüm süresi ölçülebilir.
+    # İkinci kapatma (çift tık, admin + personel) ilk resolved_at'i ezmez; yine ok döner.
     try:
-        db.execute("DELETE FROM feedbacks WHERE id = ?", (fid,))
+        db.execute("UPDATE feedbacks SET resolved = 1, resolved_at = datetime('now') WHERE id = ? AND resolved = 0",
+                   (fid,))
         db.commit()
     except Exception as e:
         return jsonify({"error":"db error: "+str(e)}), 500
+    dispatch_resolved(row["fid"])
 
     # başarılı
     return jsonify({"ok": True})
@@ -273,23 +944,16 @@ def admin_resolve():
 #     return jsonify({"ok": True})
 
 
-# ADMIN API: unresolved (admin sees all)
-@app.get("/api/unresolved")
-def api_unresolved():
-    rows = query_db("""
-        SELECT f.id, f.status, f.meta, f.reported_at, f.resolved, l.code, l.name, l.type, l.floor
-        FROM feedbacks f
-        JOIN locations l ON l.id = f.location_id
-        WHERE f.resolved = 0
-        ORDER BY f.reported_at DESC
-        LIMIT 1000
-    """)
+# unresolved listeleri için ortak satır dönüştürücüler
+def _parse_meta(raw):
+    try:
+        return json.loads(raw) if raw else {}
+    except Exception:
+        return {"raw": raw}
+
+def unresolved_items(rows):
     items = []
     for r in rows:
-        try:
-            meta = json.loads(r["meta"]) if r["meta"] else {}
-        except Exception:
-            meta = {"raw": r["meta"]}
         items.append({
             "id": r["id"],
             "status": r["status"],
@@ -298,9 +962,71 @@ def api_unresolved():
             "name": r["name"],
             "type": r["type"],
             "floor": r["floor"],
-            "meta": meta
+            "assigned_to": r["assigned_to"],
+            "claimed": bool(r["claimed_at"]),
+            "meta": _parse_meta(r["meta"])
         })
-    return jsonify(items)
+    return items
+
+# compact (sütunlu) format: lokasyon ve issue sözlükleri bir kez gönderilir,
+# satırlar bunlara index ile referans verir.
+COMPACT_COLUMNS = ["id", "loc", "reported_at", "status", "issues", "note", "assigned_to", "claimed"]
+
+def unresolved_compact(rows):
+    loc_index, locations = {}, []
+    issue_index, issues = {}, []
+    out_rows = []
+    for r in rows:
+        code = r["code"]
+        li = loc_index.get(code)
+        if li is None:
+            li = loc_index[code] = len(locations)
+            locations.append([code, r["name"], r["type"], r["floor"]])
+        meta = _parse_meta(r["meta"])
+        idxs = []
+        for iss in meta.get("issues") or []:
+            k = (iss.get("id"), iss.get("label"))
+            ii = issue_index.get(k)
+            if ii is None:
+                ii = issue_index[k] = len(issues)
+                issues.append([k[0], k[1]])
+            idxs.append(ii)
+        note = meta.get("note") or meta.get("raw") or ""
+        out_rows.append([r["id"], li, r["reported_at"], r["status"], idxs, note,
+                         r["assigned_to"], 1 if r["claimed_at"] else 0])
+    return {"v": 1, "cols": COMPACT_COLUMNS, "locations": locations, "issues": issues, "rows": out_rows}
+
+def _dumps_fast(obj):
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def unresolved_response(rows):
+    # ?format=compact opt-in; varsayılan eski ayrıntılı JSON
+    if request.args.get("format") != "compact":
+        return jsonify(unresolved_items(rows))
+    body = _dumps_fast(unresolved_compact(rows))
+    resp = Response(mimetype="application/json")
+    if len(body) >= GZIP_MIN_SIZE and request.accept_encodings["gzip"]:
+        body = gzip.compress(body, compresslevel=5)
+        resp.headers["Content-Encoding"] = "gzip"
+    resp.set_data(body)
+    resp.headers["Vary"] = "Accept-Encoding"
+    return resp
+
+# ADMIN API: unresolved (admin sees all)
+@app.get("/api/unresolved")
+def api_unresolved():
+    rows = query_read("""
+        SELECT f.id, f.status, f.meta, f.reported_at, f.resolved, f.assigned_to, f.claimed_at,
+               l.code, l.name, l.type, l.floor
+        FROM feedbacks f
+        JOIN locations l ON l.id = f.location_id
+        WHERE f.resolved = 0
+        ORDER BY f.reported_at DESC
+        LIMIT 1000
+    """)
+    return unresolved_response(rows)
 
 # ADMIN: staff add (only admin)
 @app.post("/admin/staff/add")
@@ -310,12 +1036,14 @@ def admin_staff_add():
     username = (request.form.get("username") or "").strip()
     password = (request.form.get("password") or "").strip()
     floors = request.form.getlist("floors")
+    chat_id = (request.form.get("chat_id") or "").strip() or None
     if not username or not password:
         return jsonify({"error":"Kullanıcı adı ve şifre gerekli"}), 400
     hashed = generate_password_hash(password)
     db = get_db()
     try:
-        db.execute("INSERT INTO users (username, password_hash, is_admin) VALUES (?,?,0)", (username, hashed))
+        db.execute("INSERT INTO users (username, password_hash, is_admin, telegram_chat_id) VALUES (?,?,0,?)",
+                   (username, hashed, chat_id))
         db.commit()
         user = query_db("SELECT id FROM users WHERE username = ?", [username], one=True)
         uid = user["id"]
@@ -347,20 +1075,38 @@ def admin_staff_delete():
     db.execute("DELETE FROM user_floors WHERE user_id = ?", (uid,))
     db.execute("DELETE FROM users WHERE id = ?", (uid,))
     db.commit()
+    dispatch_drop_staff(uid)
     return jsonify({"ok": True})
 
+# ADMIN: staff telegram chat id güncelle (boş = kaldır, kat bildirimlerine düşer)
+@app.post("/admin/staff/chat_id")
+def admin_staff_chat_id():
+    if not session.get("admin"):
+        return jsonify({"error":"unauthorized"}), 401
+    username = (request.form.get("username") or "").strip()
+    chat_id = (request.form.get("chat_id") or "").strip() or None
+    if not username:
+        return jsonify({"error":"username required"}), 400
+    db = get_db()
+    cur = db.execute("UPDATE users SET telegram_chat_id = ? WHERE username = ?", (chat_id, username))
+    db.commit()
+    if cur.rowcount == 0:
+        return jsonify({"error":"Kullanıcı bulunamadı"}), 404
+    return jsonify({"ok": True, "chat_id": chat_id})
+
 # ADMIN: list staff
 @app.get("/api/staff")
 def api_staff():
     # admin-only
     if not session.get("admin"):
         return jsonify({"error":"unauthorized"}), 401
-    rows = query_db("SELECT id, username, is_admin, created_at FROM users ORDER BY id DESC")
+    rows = query_read("SELECT id, username, is_admin, telegram_chat_id, created_at FROM users ORDER BY id DESC")
     out = []
     for r in rows:
-        floors = query_db("SELECT floor FROM user_floors WHERE user_id = ?", [r["id"]])
+        floors = query_read("SELECT floor FROM user_floors WHERE user_id = ?", [r["id"]])
         floor_list = [fr["floor"] for fr in floors]
-        out.append({"id": r["id"], "username": r["username"], "is_admin": r["is_admin"], "floors": floor_list})
+        out.append({"id": r["id"], "username": r["username"], "is_admin": r["is_admin"],
+                    "chat_id": r["telegram_chat_id"], "floors": floor_list})
     return jsonify(out)
 
 # STAFF: login
@@ -396,37 +1142,273 @@ def staff_api_unresolved():
     sid = session.get("staff_id")
     if not sid:
         return jsonify({"error":"unauthorized"}), 401
-    floors = query_db("SELECT floor FROM user_floors WHERE user_id = ?", [sid])
+    floors = query_read("SELECT floor FROM user_floors WHERE user_id = ?", [sid])
     floor_list = [f["floor"] for f in floors]
     if not floor_list:
         return jsonify([])
     placeholders = ",".join(["?"]*len(floor_list))
+    # başkasına atanmış işler gösterilmez (aynı yere birden fazla kişi gitmesin)
     sql = f"""
-        SELECT f.id, f.status, f.meta, f.reported_at, f.resolved, l.code, l.name, l.type, l.floor
+        SELECT f.id, f.status, f.meta, f.reported_at, f.resolved, f.assigned_to, f.claimed_at,
+               l.code, l.name, l.type, l.floor
         FROM feedbacks f
         JOIN locations l ON l.id = f.location_id
         WHERE f.resolved = 0 AND l.floor IN ({placeholders})
-        ORDER BY f.reported_at DESC
+          AND (f.assigned_to IS NULL OR f.assigned_to = ?)
+        ORDER BY f.reported_at, f.id
         LIMIT 1000
     """
-    rows = query_db(sql, floor_list)
-    items = []
-    for r in rows:
-        try:
-            meta = json.loads(r["meta"]) if r["meta"] else {}
-        except Exception:
-            meta = {"raw": r["meta"]}
-        items.append({
-            "id": r["id"],
-            "status": r["status"],
-            "reported_at": r["reported_at"],
-            "code": r["code"],
-            "name": r["name"],
-            "type": r["type"],
-            "floor": r["floor"],
-            "meta": meta
-        })
-    return jsonify(items)
+    rows = query_read(sql, floor_list + [sid])
+    # dispatch kuyruğu ile aynı öncelik: önce önem derecesi, sonra en eski
+    rows = sorted(rows, key=lambda r: (-meta_severity(r["meta"]), r["reported_at"]))
+    return unresolved_response(rows)
+
+# STAFF API: dispatch claim / release
+def _request_feedback_id():
+    fid = request.form.get("feedback_id") or (request.get_json(silent=True) or {}).get("feedback_id")
+    try:
+        return int(fid)
+    except (TypeError, ValueError):
+        return None
+
+@app.post("/staff/api/claim")
+def staff_api_claim():
+    sid = session.get("staff_id")
+    if not sid:
+        return jsonify({"error":"unauthorized"}), 401
+    fid = _request_feedback_id()
+    if fid is None:
+        return jsonify({"error":"missing id"}), 400
+    floors = [r["floor"] for r in query_db("SELECT floor FROM user_floors WHERE user_id = ?", [sid])]
+    err, code = dispatch_claim(fid, sid, floors)
+    if err:
+        return jsonify({"error": err}), code
+    return jsonify({"ok": True})
+
+@app.post("/staff/api/release")
+def staff_api_release():
+    sid = session.get("staff_id")
+    if not session.get("admin") and not sid:
+        return jsonify({"error":"unauthorized"}), 401
+    fid = _request_feedback_id()
+    if fid is None:
+        return jsonify({"error":"missing id"}), 400
+    err, code = dispatch_release(fid, None if session.get("admin") else sid)
+    if err:
+        return jsonify({"error": err}), code
+    return jsonify({"ok": True})
+
+# ADMIN API: dispatch durumu ve çözüm süresi
+@app.get("/api/dispatch/stats")
+def api_dispatch_stats():
+    if not session.get("admin"):
+        return jsonify({"error":"unauthorized"}), 401
+    _dispatch_load()
+    with _dispatch_lock:
+        load = {uid: n for uid, n in _dispatch_load_count.items() if n}
+        open_count = len(_dispatch_items)
+        unassigned = sum(1 for it in _dispatch_items.values() if it["assigned_to"] is None)
+    ttr = query_read("""
+        SELECT COUNT(*) AS n,
+               AVG((julianday(resolved_at) - julianday(reported_at)) * 86400) AS avg_s,
+               MAX((julianday(resolved_at) - julianday(reported_at)) * 86400) AS max_s
+        FROM feedbacks
+        WHERE resolved = 1 AND resolved_at IS NOT NULL AND resolved_at >= datetime('now', '-7 days')
+    """, one=True)
+    return jsonify({
+        "open": open_count,
+        "unassigned": unassigned,
+        "load": {str(uid): n for uid, n in load.items()},
+        "sla_seconds": DISPATCH_SLA_SECONDS,
+        "last_sweep": _dispatch_state["last_sweep"],
+        "resolved_7d": ttr["n"],
+        "avg_resolution_seconds": ttr["avg_s"],
+        "max_resolution_seconds": ttr["max_s"],
+    })
+
+# ADMIN API: bildirim arama (FTS5)
+def fts_query(text):
+    # kullanıcı girdisini güvenli FTS ifadesine çevir: her kelime prefix eşleşmeli, hepsi AND
+    terms = [t.replace('"', "") for t in (text or "").split()]
+    return " ".join(f'"{t}"*' for t in terms if t)
+
+@app.get("/api/search")
+def api_search():
+    # q varsa bm25 sırası (page ile), sadece filtre varsa yeniden eskiye (before=son id ile keyset)
+    if not session.get("admin"):
+        return jsonify({"error":"unauthorized"}), 401
+    match = fts_query(request.args.get("q"))
+    try:
+        page = max(int(request.args.get("page", 1)), 1)
+        per_page = min(max(int(request.args.get("per_page", 20)), 1), SEARCH_MAX_PER_PAGE)
+        before = int(request.args["before"]) if request.args.get("before") else None
+    except ValueError:
+        return jsonify({"error":"page/per_page/before sayı olmalı"}), 400
+    where, args = [], []
+    if request.args.get("from"):
+        where.append("f.reported_at >= ?")
+        args.append(request.args["from"])
+    if request.args.get("to"):
+        where.append("f.reported_at < date(?, '+1 day')")
+        args.append(request.args["to"])
+    if request.args.get("floor"):
+        where.append("l.floor = ?")
+        args.append(request.args["floor"])
+    if request.args.get("loc"):
+        where.append("l.code = ?")
+        args.append(request.args["loc"])
+    if not match and not where:
+        return jsonify({"error":"q veya filtre (from, to, floor, loc) gerekli"}), 400
+    # bir fazla satır çekilir: sonraki sayfa var mı? (COUNT(*) milyonlarca eşleşmede pahalı)
+    if match and not where:
+        # filtre yok: sıralama ve LIMIT FTS tablosunda kalır (FTS5 rank kısayolu),
+        # join'ler sadece sayfadaki satırlar için yapılır
+        hits_sql = """
+            SELECT rowid AS id, rank FROM feedbacks_fts
+            WHERE feedbacks_fts MATCH ? AND rank MATCH 'bm25(1.0, 0.5, 0.8)'
+            ORDER BY rank LIMIT ? OFFSET ?
+        """
+        hits_args = [match, per_page + 1, (page - 1) * per_page]
+    elif match:
+        hits_sql = f"""
+            SELECT feedbacks_fts.rowid AS id, feedbacks_fts.rank AS rank
+            FROM feedbacks_fts
+            JOIN feedbacks f ON f.id = feedbacks_fts.rowid
+            JOIN locations l ON l.id = f.location_id
+            WHERE feedbacks_fts MATCH ? AND feedbacks_fts.rank MATCH 'bm25(1.0, 0.5, 0.8)' AND {" AND ".join(where)}
+            ORDER BY rank LIMIT ? OFFSET ?
+        """
+        hits_args = [match] + args + [per_page + 1, (page - 1) * per_page]
+    else:
+        # sadece filtre: rowid sırasında geriye doğru taranır, OFFSET yerine before kullanılır
+        if before is not None:
+            where.append("f.id < ?")
+            args.append(before)
+        hits_sql = f"""
+            SELECT f.id AS id, NULL AS rank
+            FROM feedbacks f
+            JOIN locations l ON l.id = f.location_id
+            WHERE {" AND ".join(where)}
+            ORDER BY f.id DESC
+            LIMIT ? OFFSET ?
+        """
+        hits_args = args + [per_page + 1, 0 if before is not None else (page - 1) * per_page]
+    try:
+        hits = query_read(hits_sql, hits_args)
+        ids = [h["id"] for h in hits[:per_page]]
+        placeholders = ",".join(["?"]*len(ids))
+        rows = {r["id"]: r for r in query_read(f"""
+            SELECT f.id, f.status, f.reported_at, f.resolved, l.code, l.name, l.floor
+            FROM feedbacks f JOIN locations l ON l.id = f.location_id
+            WHERE f.id IN ({placeholders})
+        """, ids)} if ids else {}
+        snippets = {}
+        if match and ids:
+            snippets = {r["rowid"]: r["snippet"] for r in query_read(f"""
+                SELECT rowid, snippet(feedbacks_fts, -1, '[', ']', '…', 12) AS snippet
+                FROM feedbacks_fts WHERE feedbacks_fts MATCH ? AND rowid IN ({placeholders})
+            """, [match] + ids)}
+    except sqlite3.OperationalError as e:
+        return jsonify({"error":"arama hatası: "+str(e)}), 400
+    items = [{
+        "id": h["id"],
+        "status": rows[h["id"]]["status"],
+        "reported_at": rows[h["id"]]["reported_at"],
+        "resolved": rows[h["id"]]["resolved"],
+        "code": rows[h["id"]]["code"],
+        "name": rows[h["id"]]["name"],
+        "floor": rows[h["id"]]["floor"],
+        "snippet": snippets.get(h["id"]),
+        "rank": h["rank"],
+    } for h in hits[:per_page] if h["id"] in rows]
+    out = {"page": page, "per_page": per_page, "has_more": len(hits) > per_page, "items": items}
+    if not match:
+        out["order"] = "recent"
+        out["next_before"] = ids[-1] if len(hits) > per_page else None
+    return jsonify(out)
+
+# ADMIN API: bildirim gönderim istatistikleri
+@app.get("/api/notify/stats")
+def api_notify_stats():
+    if not session.get("admin"):
+        return jsonify({"error":"unauthorized"}), 401
+    return jsonify(notify_pool.stats())
+
+# ADMIN API: okuma yolu durumu
+@app.get("/api/replica/stats")
+def api_replica_stats():
+    if not session.get("admin"):
+        return jsonify({"error":"unauthorized"}), 401
+    return jsonify({
+        "mode": READ_REPLICA,
+        "max_staleness_seconds": READ_MAX_STALENESS,
+        "staleness_seconds": replica_staleness(),
+        "refreshes": _replica_state["refreshes"],
+        "skipped_unchanged": _replica_state["skipped"],
+        "last_refresh_seconds": _replica_state["last_duration"],
+    })
+
+# BACKUP: zamanlanmış çevrimiçi yedek (bkz. backup.py)
+# api_feedback ve toplu gönderim yazma süreleri tutulur; yedek sırasındaki ortalama, öncesiyle karşılaştırılır.
+_write_latencies = deque(maxlen=5000)   # (başlangıç, süre sn)
+_backup_lock = threading.Lock()
+_backup_state = {"last": None, "runs": 0, "errors": 0, "last_error": None, "worker": None}
+
+def _avg_write_latency(start, end):
+    vals = [d for t, d in list(_write_latencies) if start <= t <= end]
+    return (sum(vals) / len(vals), len(vals)) if vals else (None, 0)
+
+def run_scheduled_backup():
+    started = time.time()
+    try:
+        stats = backup.create_backup(DB_PATH)
+    except Exception as e:
+        _backup_state["errors"] += 1
+        _backup_state["last_error"] = str(e)
+        print("Yedekleme hatası:", e)
+        return None
+    ended = time.time()
+    during, n_during = _avg_write_latency(started, ended)
+    before, _ = _avg_write_latency(started - 300, started)
+    stats.update({
+        "finished_at": datetime.utcnow().isoformat() + "Z",
+        "write_latency_during": during,
+        "write_latency_before": before,
+        "write_latency_added": (during - before) if during is not None and before is not None else None,
+        "writes_during": n_during,
+    })
+    _backup_state["last"] = stats
+    _backup_state["runs"] += 1
+    print(f"[BACKUP] {stats['path']} - {stats['duration_seconds']:.2f} sn - ek yazma gecikmesi: {stats['write_latency_added']}")
+    return stats
+
+def start_backup_scheduler():
+    # süreç başına bir kez (before_request'ten çağrılır)
+    if BACKUP_INTERVAL_MINUTES <= 0:
+        return None
+    def loop():
+        while True:
+            time.sleep(BACKUP_INTERVAL_MINUTES * 60)
+            run_scheduled_backup()
+    with _backup_lock:
+        if _backup_state["worker"] is None:
+            t = threading.Thread(target=loop, name="backup-scheduler", daemon=True)
+            t.start()
+            _backup_state["worker"] = t
+    return _backup_state["worker"]
+
+@app.get("/api/backup/stats")
+def api_backup_stats():
+    if not session.get("admin"):
+        return jsonify({"error":"unauthorized"}), 401
+    return jsonify({
+        "interval_minutes": BACKUP_INTERVAL_MINUTES,
+        "runs": _backup_state["runs"],
+        "errors": _backup_state["errors"],
+        "last_error": _backup_state["last_error"],
+        "last": _backup_state["last"],
+        "backups": [os.path.basename(p) for _, p in backup.list_backups()],
+    })
 
 # admin index redirect
 @app.get("/")
@@ -435,4 +1417,7 @@ def index():
 
 if __name__ == "__main__":
     print("Sunucu başlatılıyor: http://localhost:5000")
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    with app.app_context():
+        init_db()
+    # yedek zamanlayıcısı ilk istekte başlar (reloader'ın izleyici süreci istek almaz)
+    app.run(host="0.0.0.0", port=5000, debug=os.getenv("FLASK_DEBUG", "1") == "1")
@@ -0,0 +1,226 @@
+# backup.py - uygulama çalışırken yedek alma (SQLite backup API) ve geri yükleme
+# Kullanım:
+#   python backup.py backup                       # yedek al, doğrula, sıkıştır, eskileri sil
+#   python backup.py list
+#   python backup.py verify backups/data.20261019_120000.db.gz
+#   python backup.py restore backups/data.20261019_120000.db.gz
+#   python backup.py restore --at "2026-10-19 12:00"   # o zamandan önceki en yeni yedek
+import os, sys, gzip, time, shutil, sqlite3, argparse, tempfile
+from datetime import datetime
+
+DB_PATH = os.path.join(os.path.dirname(__file__), "data.db")
+BACKUP_DIR = os.path.join(os.path.dirname(__file__), "backups")
+BACKUP_PAGES_PER_STEP = int(os.getenv("BACKUP_PAGES_PER_STEP", "256"))
+BACKUP_STEP_SLEEP = float(os.getenv("BACKUP_STEP_SLEEP", "0.005"))
+BACKUP_KEEP = int(os.getenv("BACKUP_KEEP", "14"))
+BACKUP_MAX_RESTARTS = 3
+TS_FORMAT = "%Y%m%d_%H%M%S"
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+def _copy(src, dst, pages, sleep):
+    # WAL modunda tek geçiş: kopya tek okuma transaction'ında alınır, yazıcılar bloklanmaz
+    # (sadece checkpoint kopya bitene kadar bekler). Adımlı kopya burada her commit'te
+    # baştan başlar ve I/O'yu katlar.
+    stats = {"steps": 0, "restarts": 0, "max_step_seconds": 0.0, "pages": 0}
+    if src.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal":
+        step_started = time.time()
+        src.backup(dst)
+        stats.update(steps=1, single_pass=True, max_step_seconds=time.time() - step_started,
+                     pages=dst.execute("PRAGMA page_count").fetchone()[0])
+        return stats
+    # diğer modlarda küçük adımlarla kopyala; her adım arasında kaynak kilidi bırakılır.
+    # Başka bir bağlantı kaynağa yazarsa SQLite kopyayı baştan başlatır; çok sık olursa
+    # tek geçişe düşülür.
+    last = {"remaining": None, "t": time.time()}
+
+    def progress(status, remaining, total):
+        now = time.time()
+        stats["steps"] += 1
+        stats["pages"] = total
+        stats["max_step_seconds"] = max(stats["max_step_seconds"], now - last["t"])
+        if last["remaining"] is not None and remaining > last["remaining"]:
+            stats["restarts"] += 1
+            if stats["restarts"] > BACKUP_MAX_RESTARTS:
+                raise _TooManyRestarts()
+        last["remaining"] = remaining
+        if sleep:
+            time.sleep(sleep)
+        last["t"] = time.time()
+
+    try:
+        src.backup(dst, pages=pages, progress=progress)
+    except _TooManyRestarts:
+        src.backup(dst)
+        stats["single_pass"] = True
+    return stats
+
+
+def integrity_check(path):
+    conn = sqlite3.connect(path)
+    try:
+        rows = [r[0] for r in conn.execute("PRAGMA integrity_check").fetchall()]
+    finally:
+        conn.close()
+    return rows == ["ok"], rows
+
+
+def _gzip(src_path, dst_path):
+    with open(src_path, "rb") as f_in, gzip.open(dst_path, "wb", compresslevel=6) as f_out:
+        shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+
+
+def _gunzip(src_path, dst_path):
+    with gzip.open(src_path, "rb") as f_in, open(dst_path, "wb") as f_out:
+        shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+
+
+def list_backups(backup_dir=BACKUP_DIR):
+    # (zaman, yol) listesi, eskiden yeniye
+    out = []
+    if not os.path.isdir(backup_dir):
+        return out
+    for name in os.listdir(backup_dir):
+        if name.startswith("data.") and name.endswith(".db.gz"):
+            try:
+                ts = datetime.strptime(name[len("data."):-len(".db.gz")], TS_FORMAT)
+            except ValueError:
+                continue
+            out.append((ts, os.path.join(backup_dir, name)))
+    return sorted(out)
+
+
+def rotate(backup_dir=BACKUP_DIR, keep=BACKUP_KEEP):
+    # keep <= 0: hiçbir şey silinmez
+    if keep <= 0:
+        return []
+    removed = []
+    for _, path in list_backups(backup_dir)[:-keep]:
+        os.remove(path)
+        removed.append(path)
+    return removed
+
+
+def create_backup(db_path=DB_PATH, backup_dir=BACKUP_DIR, pages=BACKUP_PAGES_PER_STEP,
+                  sleep=BACKUP_STEP_SLEEP, keep=BACKUP_KEEP):
+    os.makedirs(backup_dir, exist_ok=True)
+    started = time.time()
+    ts = datetime.now().strftime(TS_FORMAT)
+    # aynı saniyede ikinci yedek (örn. geri yükleme öncesi) önceki dosyanın üzerine yazmasın
+    while os.path.exists(os.path.join(backup_dir, f"data.{ts}.db.gz")):
+        time.sleep(0.2)
+        ts = datetime.now().strftime(TS_FORMAT)
+    tmp = os.path.join(backup_dir, f"data.{ts}.db.tmp")
+    dest = os.path.join(backup_dir, f"data.{ts}.db.gz")
+    src = sqlite3.connect(db_path)
+    dst = sqlite3.connect(tmp)
+    try:
+        stats = _copy(src, dst, pages, sleep)
+        # yedek tek dosya olsun (WAL başlığı kopyalanır)
+        dst.execute("PRAGMA journal_mode = DELETE")
+    finally:
+        dst.close()
+        src.close()
+    copy_seconds = time.time() - started
+    try:
+        ok, rows = integrity_check(tmp)
+        if not ok:
+            raise RuntimeError("integrity_check başarısız: " + "; ".join(rows[:5]))
+        _gzip(tmp, dest)
+    finally:
+        os.remove(tmp)
+    stats.update({
+        "path": dest,
+        "size": os.path.getsize(dest),
+        "copy_seconds": copy_seconds,
+        "duration_seconds": time.time() - started,
+        "rotated": rotate(backup_dir, keep),
+    })
+    return stats
+
+
+def verify_backup(path):
+    fd, tmp = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    try:
+        _gunzip(path, tmp)
+        return integrity_check(tmp)
+    finally:
+        os.remove(tmp)
+
+
+def pick_backup(at, backup_dir=BACKUP_DIR):
+    # at anına kadar alınmış en yeni yedek
+    candidates = [p for ts, p in list_backups(backup_dir) if ts <= at]
+    return candidates[-1] if candidates else None
+
+
+def restore_backup(path, db_path=DB_PATH, backup_dir=BACKUP_DIR):
+    # yedek doğrulanır, mevcut veri önce yedeklenir, sonra backup API ile canlı dosyaya yazılır.
+    # Çalışan uygulama bağlantıları yeni içeriği görür; bellekteki kuyruklar yeniden başlatmada yenilenir.
+    fd, tmp = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    try:
+        _gunzip(path, tmp)
+        ok, rows = integrity_check(tmp)
+        if not ok:
+            raise RuntimeError("yedek bozuk: " + "; ".join(rows[:5]))
+        safety = create_backup(db_path, backup_dir, keep=0) if os.path.exists(db_path) else None
+        src = sqlite3.connect(tmp)
+        dst = sqlite3.connect(db_path, timeout=30)
+        try:
+            src.backup(dst)
+        finally:
+            dst.close()
+            src.close()
+    finally:
+        os.remove(tmp)
+    return safety
+
+
+def main():
+    p = argparse.ArgumentParser(description="data.db çevrimiçi yedekleme / geri yükleme")
+    p.add_argument("--db", default=DB_PATH)
+    p.add_argument("--dir", default=BACKUP_DIR)
+    sub = p.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("backup")
+    sub.add_parser("list")
+    v = sub.add_parser("verify")
+    v.add_argument("path")
+    r = sub.add_parser("restore")
+    r.add_argument("path", nargs="?")
+    r.add_argument("--at", help="YYYY-MM-DD HH:MM[:SS]; bu zamandan önceki en yeni yedek")
+    args = p.parse_args()
+
+    if args.cmd == "backup":
+        s = create_backup(args.db, args.dir)
+        print(f"Yedek: {s['path']} ({s['size']} bayt)")
+        print(f"Süre: {s['duration_seconds']:.2f} sn (kopya {s['copy_seconds']:.2f} sn, {s['steps']} adım, "
+              f"{s['restarts']} yeniden başlama), en uzun adım {s['max_step_seconds'] * 1000:.1f} ms")
+        for path in s["rotated"]:
+            print("Silindi:", path)
+    elif args.cmd == "list":
+        for ts, path in list_backups(args.dir):
+            print(ts.strftime("%Y-%m-%d %H:%M:%S"), path, os.path.getsize(path))
+    elif args.cmd == "verify":
+        ok, rows = verify_backup(args.path)
+        print("ok" if ok else "HATA: " + "; ".join(rows[:5]))
+        sys.exit(0 if ok else 1)
+    elif args.cmd == "restore":
+        path = args.path
+        if args.at:
+            path = pick_backup(datetime.fromisoformat(args.at), args.dir)
+        if not path:
+            print("Uygun yedek bulunamadı.")
+            sys.exit(1)
+        safety = restore_backup(path, args.db, args.dir)
+        if safety:
+            print("Geri yükleme öncesi yedek:", safety["path"])
+        print("Geri yüklendi:", path)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 # db_init.py
 # Güvenli şekilde mevcut data.db'yi yedekler ve yeni, doğru şemayla data.db oluşturur.
-import os, sqlite3, shutil, datetime
+import os, sqlite3
+import backup
 DB = os.path.join(os.path.dirname(__file__), "data.db")
 BACKUP_DIR = os.path.join(os.path.dirname(__file__), "backups")
 
@@ -14,11 +15,12 @@ except Exception:
 
 def backup_existing_db():
     if os.path.exists(DB):
-        os.makedirs(BACKUP_DIR, exist_ok=True)
-        ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        dest = os.path.join(BACKUP_DIR, f"data.db.bak.{ts}")
-        shutil.move(DB, dest)
-        print(f"Mevcut data.db yedeklendi -> {dest}")
+        # backup API ile doğrulanmış, sıkıştırılmış kopya; sonra eski dosyalar kaldırılır
+        stats = backup.create_backup(DB, BACKUP_DIR, keep=0)
+        for path in (DB, DB + "-wal", DB + "-shm"):
+            if os.path.exists(path):
+                os.remove(path)
+        print(f"Mevcut data.db yedeklendi -> {stats['path']}")
     else:
         print("Mevcut data.db bulunmuyor. Yeni veritabanı oluşturulacak.")
 
@@ -48,14 +50,25 @@ def create_schema_and_seed():
         meta TEXT,
         reported_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         resolved INTEGER DEFAULT 0,
+        assigned_to INTEGER,
+        assigned_at TIMESTAMP,
+        claimed_at TIMESTAMP,
+        resolved_at TIMESTAMP,
+        client_key TEXT,
         FOREIGN KEY(location_id) REFERENCES locations(id)
     );
 
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_feedbacks_client_key ON feedbacks(client_key);
+    CREATE INDEX IF NOT EXISTS idx_feedbacks_open ON feedbacks(reported_at) WHERE resolved = 0;
+    CREATE INDEX IF NOT EXISTS idx_feedbacks_reported_at ON feedbacks(reported_at);
+    CREATE INDEX IF NOT EXISTS idx_feedbacks_location ON feedbacks(location_id, id);
+
     CREATE TABLE IF NOT EXISTS users (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         username TEXT UNIQUE,
         password_hash TEXT,
         is_admin INTEGER DEFAULT 0,
+        telegram_chat_id TEXT,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
     );
 
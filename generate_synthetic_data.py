@@ -0,0 +1,176 @@
+# generate_synthetic_data.py - benchmark / kapasite planlaması için büyük, tekrarlanabilir veri seti
+# Örnek: python generate_synthetic_data.py --db bench.db --locations 20000 --feedbacks 10000000 --seed 42
+# Aynı seed ile aynı veri üretilir. QR üretmez; data.db yerine ayrı bir dosya kullanılması önerilir.
+import os, sys, json, time, math, random, sqlite3, argparse, itertools
+from datetime import datetime, timedelta, timezone
+
+import app as app_module
+from app import options_for_type
+
+# saatlik rapor yoğunluğu (0-23): sabah ve akşam ziyaret saatlerinde tepe
+HOUR_WEIGHTS = [1, 1, 1, 1, 1, 2, 4, 8, 12, 14, 13, 11, 10, 10, 9, 8, 9, 11, 12, 10, 7, 4, 2, 1]
+ISSUE_WEIGHTS = {
+    "toilet": {"dirty": 35, "paper_out": 25, "soap_out": 20, "floor_wet": 20},
+    "room": {"cleaning_needed": 35, "linen_change": 25, "room_vacated": 20, "trash_full": 20},
+}
+ISSUE_COUNT_WEIGHTS = [70, 25, 5]   # 1, 2, 3 seçenek
+NOTE_RATE = 0.15
+NOTES = [
+    "Lavabo tıkanmış", "Musluk sızdırıyor", "Kötü koku var", "Kağıt havlu yok",
+    "Yerde su birikintisi", "Çöp kutusu taşmış", "Hasta taburcu oldu", "Ayna kirli",
+]
+RESOLVE_MEAN_MINUTES = 25
+OPEN_WINDOW_HOURS = 6   # son saatlerdeki bildirimlerin bir kısmı açık kalır
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Sentetik lokasyon ve bildirim verisi üretir.")
+    p.add_argument("--db", default=os.path.join(os.path.dirname(__file__), "bench.db"))
+    p.add_argument("--floors", type=int, default=20)
+    p.add_argument("--locations", type=int, default=20000)
+    p.add_argument("--feedbacks", type=int, default=1000000,
+                   help="tam günler için hedef; bugünün şimdiden sonraki payı üretilmez")
+    p.add_argument("--days", type=int, default=365)
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--end", help="son rapor zamanı (ISO, UTC); verilmezse şimdi. Tam tekrarlanabilirlik için verin")
+    p.add_argument("--batch", type=int, default=50000, help="executemany başına satır")
+    p.add_argument("--commit-every", type=int, default=1000000, help="transaction başına satır")
+    return p.parse_args()
+
+
+def tune(conn):
+    # toplu yükleme için journal/sync kapalı; bittiğinde normale döndürülür
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA cache_size = -262144")
+    conn.execute("PRAGMA temp_store = MEMORY")
+
+
+def untune(conn):
+    # app.init_db ile aynı: WAL
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = FULL")
+
+
+def report(label, rows, started):
+    elapsed = time.time() - started
+    rate = rows / elapsed if elapsed > 0 else float("inf")
+    print(f"{label}: {rows} satır, {elapsed:.1f} sn, {rate:,.0f} satır/sn")
+
+
+def gen_locations(n, floors):
+    per_floor = math.ceil(n / floors)
+    rows = []
+    for i in range(n):
+        floor = i // per_floor + 1
+        idx = i % per_floor + 1
+        # her 4 lokasyondan biri WC, diğerleri oda
+        typ = "toilet" if idx % 4 == 1 else "room"
+        code = f"S{floor:03d}-{idx:05d}"
+        name = f"{floor}. Kat - " + (f"WC {idx}" if typ == "toilet" else f"Oda {idx}")
+        rows.append((code, name, typ, f"{app_module.APP_URL}/feedback?loc={code}", floor))
+    return rows
+
+
+def main():
+    args = parse_args()
+    rng = random.Random(args.seed)
+
+    # şema app.init_db ile aynı kalsın
+    app_module.DB_PATH = args.db
+    with app_module.app.app_context():
+        app_module.init_db()
+
+    conn = sqlite3.connect(args.db)
+    tune(conn)
+    # FTS trigger'ları ve ikincil indeksler yükleme boyunca kaldırılır; sonda init_db yeniden kurar
+    for trg in ("feedbacks_fts_ai", "feedbacks_fts_ad", "feedbacks_fts_au"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {trg}")
+    for idx in ("idx_feedbacks_open", "idx_feedbacks_reported_at", "idx_feedbacks_location"):
+        conn.execute(f"DROP INDEX IF EXISTS {idx}")
+
+    started = time.time()
+    conn.executemany("INSERT OR IGNORE INTO locations (code, name, type, qr_url, floor, created_at) VALUES (?,?,?,?,?,datetime('now'))",
+                     gen_locations(args.locations, args.floors))
+    conn.commit()
+    report("locations", args.locations, started)
+
+    locs = conn.execute("SELECT id, type FROM locations WHERE code LIKE 'S%' ORDER BY id").fetchall()
+    if not locs:
+        print("Lokasyon bulunamadı.")
+        sys.exit(1)
+    loc_ids = [l[0] for l in locs]
+    loc_types = {l[0]: ("toilet" if l[1] == "toilet" else "room") for l in locs}
+    # lokasyon popülerliği Zipf benzeri: bazı WC'ler çok daha yoğun
+    loc_cum = list(itertools.accumulate(1.0 / (r + 1) ** 0.8 for r in range(len(loc_ids))))
+    rng.shuffle(loc_ids)
+    labels = {t: {o["id"]: o["label"] for o in options_for_type(t)} for t in ISSUE_WEIGHTS}
+    issue_ids = {t: list(w) for t, w in ISSUE_WEIGHTS.items()}
+    issue_w = {t: list(w.values()) for t, w in ISSUE_WEIGHTS.items()}
+    hours = list(range(24))
+
+    if args.end:
+        now = datetime.fromisoformat(args.end).replace(tzinfo=timezone.utc)
+    else:
+        now = datetime.now(timezone.utc).replace(microsecond=0)
+    # son gün bugündür
+    start_day = (now - timedelta(days=args.days - 1)).replace(hour=0, minute=0, second=0)
+    per_day = args.feedbacks / args.days
+
+    sql = """INSERT INTO feedbacks (location_id, status, meta, reported_at, resolved, resolved_at)
+             VALUES (?,?,?,?,?,?)"""
+    started = time.time()
+    total, since_commit, batch = 0, 0, []
+    for day in range(args.days):
+        n = int(per_day * (day + 1)) - int(per_day * day)
+        day_start = start_day + timedelta(days=day)
+        # bugün tam gün gibi üretilir, şimdiden sonraki raporlar atılır (saatlik dağılım bozulmaz)
+        span = min(86400, int((now - day_start).total_seconds()))
+        offsets = sorted(off for off in (h * 3600 + rng.randrange(3600)
+                                         for h in rng.choices(hours, HOUR_WEIGHTS, k=n)) if off <= span)
+        for off, lid in zip(offsets, rng.choices(loc_ids, cum_weights=loc_cum, k=len(offsets))):
+            ts = day_start + timedelta(seconds=off)
+            typ = loc_types[lid]
+            k = rng.choices((1, 2, 3), ISSUE_COUNT_WEIGHTS)[0]
+            picked = []
+            for iid in rng.choices(issue_ids[typ], issue_w[typ], k=k):
+                if iid not in picked:
+                    picked.append(iid)
+            issues = [{"id": i, "label": labels[typ][i]} for i in picked]
+            note = rng.choice(NOTES) if rng.random() < NOTE_RATE else ""
+            status = ", ".join(i["label"] for i in issues)
+            meta = json.dumps({"issues": issues, "note": note, "reported_at": ts.isoformat().replace("+00:00", "Z")},
+                              ensure_ascii=False)
+            if (now - ts).total_seconds() < OPEN_WINDOW_HOURS * 3600 and rng.random() < 0.5:
+                resolved, resolved_at = 0, None
+            else:
+                done = min(ts + timedelta(minutes=rng.expovariate(1.0 / RESOLVE_MEAN_MINUTES)), now)
+                resolved, resolved_at = 1, done.strftime("%Y-%m-%d %H:%M:%S")
+            batch.append((lid, status, meta, ts.strftime("%Y-%m-%d %H:%M:%S"), resolved, resolved_at))
+            if len(batch) >= args.batch:
+                conn.executemany(sql, batch)
+                total += len(batch)
+                since_commit += len(batch)
+                batch = []
+                if since_commit >= args.commit_every:
+                    conn.commit()
+                    since_commit = 0
+                    report("feedbacks (ara)", total, started)
+    if batch:
+        conn.executemany(sql, batch)
+        total += len(batch)
+    conn.commit()
+    report("feedbacks", total, started)
+    untune(conn)
+    conn.close()
+
+    # indeksler, arama indeksi ve trigger'lar (init_search_index eksik satırları toplu ekler)
+    started = time.time()
+    with app_module.app.app_context():
+        app_module.init_db()
+    report("indeksler", total, started)
+    print(f"Tamam: {args.db}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# notify.py - bildirim gönderim havuzu (kat / personel bazlı yönlendirme için)
+# Mesajlar chat bazında kuyruğa alınır; worker thread'ler chat başına ve global hız
+# limitlerine uyarak gönderir. Bir chat kısıtlı iken biriken mesajlar tek özet mesajda birleşir.
+import threading
+import time
+from collections import deque
+
+import requests
+
+TELEGRAM_MAX_TEXT = 4000
+
+
+class TelegramTransport:
+    # base_url değiştirilebilir: testlerde yerel bir HTTP stub'a yönlendirilir
+    def __init__(self, token, base_url="https://api.telegram.org", timeout=10):
+        self.token = token
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def send(self, chat_id, text):
+        # (ok, retry_after) döner; retry_after sadece 429'da dolu
+        url = f"{self.base_url}/bot{self.token}/sendMessage"
+        try:
+            resp = requests.post(url, data={"chat_id": chat_id, "text": text}, timeout=self.timeout)
+        except Exception as e:
+            print("Telegram error:", e)
+            return False, None
+        if resp.status_code == 429:
+            try:
+                retry_after = float(resp.json().get("parameters", {}).get("retry_after", 1))
+            except Exception:
+                retry_after = 1.0
+            return False, retry_after
+        return resp.status_code == 200, None
+
+
+class SenderPool:
+    def __init__(self, transport, workers=4, chat_interval=1.0, global_rate=25.0,
+                 digest_max=20, max_attempts=3):
+        self.transport = transport
+        self.workers = workers
+        self.chat_interval = chat_interval
+        self.global_interval = 1.0 / global_rate if global_rate else 0.0
+        self.digest_max = digest_max
+        self.max_attempts = max_attempts
+        self._cond = threading.Condition()
+        self._pending = {}       # chat_id -> deque[(text, enqueued_ts, attempts)]
+        self._next_ok = {}       # chat_id -> bir sonraki gönderimin en erken zamanı
+        self._inflight = set()
+        self._global_next = 0.0
+        self._global_lock = threading.Lock()
+        self._threads = []
+        self._latencies = deque(maxlen=1000)
+        self._counters = {"enqueued": 0, "sent": 0, "delivered": 0, "failed": 0, "digests": 0, "throttled": 0}
+
+    def submit(self, chat_id, text):
+        if not chat_id:
+            return False
+        with self._cond:
+            self._pending.setdefault(str(chat_id), deque()).append((text, time.time(), 0))
+            self._counters["enqueued"] += 1
+            self._start()
+            self._cond.notify()
+        return True
+
+    def _start(self):
+        if self._threads:
+            return
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"notify-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def _take(self):
+        # gönderilmeye hazır bir chat seç; yoksa en yakın zamana kadar bekle
+        while True:
+            now = time.time()
+            wait = None
+            for chat_id, q in self._pending.items():
+                if not q or chat_id in self._inflight:
+                    continue
+                ready_at = self._next_ok.get(chat_id, 0.0)
+                if ready_at <= now:
+                    batch = [q.popleft() for _ in range(min(len(q), self.digest_max))]
+                    self._inflight.add(chat_id)
+                    return chat_id, batch
+                wait = ready_at - now if wait is None else min(wait, ready_at - now)
+            self._cond.wait(wait)
+
+    def _acquire_global(self):
+        with self._global_lock:
+            now = time.time()
+            slot = max(now, self._global_next)
+            self._global_next = slot + self.global_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def _digest(self, batch):
+        if len(batch) == 1:
+            return batch[0][0]
+        text = f"{len(batch)} yeni bildirim:\n" + "\n\n".join(b[0] for b in batch)
+        if len(text) > TELEGRAM_MAX_TEXT:
+            text = text[:TELEGRAM_MAX_TEXT - 1] + "…"
+        return text
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                chat_id, batch = self._take()
+            self._acquire_global()
+            ok, retry_after = self.transport.send(chat_id, self._digest(batch))
+            done = time.time()
+            with self._cond:
+                self._inflight.discard(chat_id)
+                if ok:
+                    self._counters["sent"] += 1
+                    self._counters["delivered"] += len(batch)
+                    if len(batch) > 1:
+                        self._counters["digests"] += 1
+                    self._latencies.extend(done - b[1] for b in batch)
+                    self._next_ok[chat_id] = done + self.chat_interval
+                else:
+                    if retry_after is not None:
+                        self._counters["throttled"] += 1
+                    retry = [(t, ts, n + 1) for t, ts, n in batch if n + 1 < self.max_attempts]
+                    self._counters["failed"] += len(batch) - len(retry)
+                    # kısıtlama süresince gelenlerle birlikte sonraki özet mesajda gider
+                    self._pending[chat_id].extendleft(reversed(retry))
+                    self._next_ok[chat_id] = done + max(retry_after or 0, self.chat_interval)
+                self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            lat = sorted(self._latencies)
+            queued = sum(len(q) for q in self._pending.values())
+            out = dict(self._counters)
+        out["queued"] = queued
+        out["latency_avg"] = sum(lat) / len(lat) if lat else None
+        out["latency_p95"] = lat[int(len(lat) * 0.95) - 1] if lat else None
+        out["latency_max"] = lat[-1] if lat else None
+        return out